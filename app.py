@@ -10,18 +10,77 @@ from routes.pages import pages_bp
 from routes.api import api_bp
 from services.security import register_security_middleware
 
-#from config.metrics import init_metrics
+from config.metrics import init_metrics
+
+def _init_json_provider(app):
+    """Usa orjson para serializar JSON si está instalado.
+
+    Los endpoints de API devuelven dicts con datetimes; orjson los
+    serializa de forma nativa en C, varias veces más rápido que el json
+    de la librería estándar. Sin orjson instalado se conserva el
+    proveedor por defecto de Flask.
+    """
+    try:
+        import orjson
+    except ImportError:
+        return
+
+    from flask.json.provider import JSONProvider
+
+    class OrjsonProvider(JSONProvider):
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, default=str).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = OrjsonProvider(app)
+
+
+def _init_session_store(app):
+    """Habilita sesiones del lado servidor si SESSION_TYPE está configurado.
+
+    Evita el HMAC + decodificación JSON de la cookie de sesión en cada
+    petición: la cookie queda reducida a un id y el contenido se lee del
+    almacén. Si Flask-Session/Redis no están disponibles se continúa con
+    la cookie firmada por defecto.
+    """
+    if not app.config.get('SESSION_TYPE'):
+        return
+
+    try:
+        from flask_session import Session
+
+        if app.config['SESSION_TYPE'] == 'redis':
+            import redis
+            app.config['SESSION_REDIS'] = redis.from_url(
+                app.config['SESSION_REDIS_URL']
+            )
+
+        Session(app)
+        print("OK — Sesiones del lado servidor habilitadas "
+              f"({app.config['SESSION_TYPE']}).")
+    except Exception as e:
+        print(f"AVISO — Sin almacén de sesiones del lado servidor, "
+              f"se usa cookie firmada: {e}")
+
 
 def create_app():
     """Application Factory — patrón recomendado por Flask."""
     app = Flask(__name__)
     app.config.from_object(Config)
 
+    # Serialización JSON acelerada (opcional, requiere orjson)
+    _init_json_provider(app)
+
     # Inicializar base de datos
     init_db(app)
 
-    # Inicializar métricas Prometheus
-    #init_metrics(app)
+    # Sesiones del lado servidor (opcional, ver SESSION_TYPE en settings)
+    _init_session_store(app)
+
+    # Inicializar métricas Prometheus (opcional, ver ENABLE_METRICS)
+    init_metrics(app)
 
     # Registrar middleware de seguridad (headers HTTP + CSRF logging)
     register_security_middleware(app)
@@ -38,5 +97,7 @@ def create_app():
 #Cambio y prueba de despliegue en Railway.app
 
 if __name__ == '__main__':
+    # Solo para desarrollo local; en producción se sirve con gunicorn
+    # (ver Procfile). El modo debug sale de FLASK_DEBUG en .env.
     app = create_app()
-    app.run(host='0.0.0.0', port=5001, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5001, debug=app.config['DEBUG'])
\ No newline at end of file
@@ -3,22 +3,36 @@ import os
 import firebase_admin
 from firebase_admin import credentials, firestore
 
+from services.cache import TTLCache
+
 # Variable global del cliente Firestore
 _db = None
 
+# Caché por proceso del documento de usuario (casi estático entre logins).
+_user_cache = TTLCache(ttl_seconds=60)
+
 
 def init_db(app):
-    """Inicializa Firebase Admin SDK al arrancar la app."""
+    """Inicializa Firebase Admin SDK al arrancar la app.
+
+    El SDK mantiene un único canal gRPC con pool de conexiones propio;
+    inicializarlo dos veces (p. ej. bajo el reloader o en tests) crearía
+    clientes duplicados, así que se reutiliza la app por defecto si existe.
+    """
     global _db
 
+    if _db is not None:
+        return
+
     cred_path = os.path.join(
         os.path.dirname(os.path.dirname(__file__)),
         'firebase-credentials.json'
     )
 
     try:
-        cred = credentials.Certificate(cred_path)
-        firebase_admin.initialize_app(cred)
+        if not firebase_admin._apps:
+            cred = credentials.Certificate(cred_path)
+            firebase_admin.initialize_app(cred)
         _db = firestore.client()
         print("OK — Conectado a Firebase Firestore exitosamente.")
     except Exception as e:
@@ -38,4 +52,34 @@ def get_users_collection():
 
 def get_habits_collection():
     """Devuelve referencia a la colección 'habits'."""
-    return _db.collection('habits') if _db else None
\ No newline at end of file
+    return _db.collection('habits') if _db else None
+
+
+def get_analytics_collection():
+    """Devuelve referencia a la colección 'analytics'."""
+    return _db.collection('analytics') if _db else None
+
+
+def get_user_cached(user_id: str):
+    """Devuelve el documento del usuario, usando la caché TTL (60 s).
+
+    Evita releer de Firestore un documento casi estático en cada petición.
+    Tras modificar el usuario hay que llamar a invalidate_user_cache().
+    """
+    user = _user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    doc = get_users_collection().document(user_id).get()
+    if not doc.exists:
+        return None
+
+    user = doc.to_dict()
+    user['_id'] = doc.id
+    _user_cache.set(user_id, user)
+    return user
+
+
+def invalidate_user_cache(user_id: str):
+    """Invalida la entrada cacheada del usuario tras una escritura."""
+    _user_cache.invalidate(user_id)
\ No newline at end of file
@@ -0,0 +1,82 @@
+# config/metrics.py — Métricas Prometheus (opcionales)
+import gzip
+import os
+import time
+
+
+def init_metrics(app):
+    """Registra las métricas y el endpoint /metrics si ENABLE_METRICS=true.
+
+    prometheus_client se importa dentro de la función: con las métricas
+    desactivadas (o la librería sin instalar) el worker no paga ni el
+    coste de importación ni la construcción del registro al arrancar.
+    """
+    if os.getenv('ENABLE_METRICS', 'False').lower() not in ('true', '1', 't'):
+        return
+
+    try:
+        from prometheus_client import (
+            CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram,
+            generate_latest, multiprocess
+        )
+    except ImportError as e:
+        print(f"AVISO — prometheus-client no disponible, métricas desactivadas: {e}")
+        return
+
+    from flask import Response, g, request
+
+    # Con varios workers de gunicorn cada proceso tiene sus contadores;
+    # PROMETHEUS_MULTIPROC_DIR activa el colector que agrega los valores
+    # de todos los workers en cada scrape.
+    registry = None
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+
+    request_count = Counter(
+        'http_requests_total',
+        'Total de peticiones HTTP',
+        ['method', 'endpoint', 'status'],
+    )
+    request_latency = Histogram(
+        'http_request_duration_seconds',
+        'Duración de las peticiones HTTP',
+        ['method', 'endpoint'],
+    )
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        endpoint = request.endpoint or 'unknown'
+        request_count.labels(request.method, endpoint, response.status_code).inc()
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            request_latency.labels(request.method, endpoint).observe(
+                time.perf_counter() - start
+            )
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        payload = (
+            generate_latest(registry) if registry is not None
+            else generate_latest()
+        )
+        headers = {'Cache-Control': 'no-store'}
+
+        # El texto de Prometheus comprime muy bien (~5x); gzip solo si el
+        # scraper lo acepta.
+        if 'gzip' in request.headers.get('Accept-Encoding', ''):
+            payload = gzip.compress(payload)
+            headers['Content-Encoding'] = 'gzip'
+
+        return Response(
+            payload,
+            mimetype=CONTENT_TYPE_LATEST,
+            headers=headers,
+        )
+
+    print("OK — Métricas Prometheus habilitadas en /metrics.")
@@ -27,7 +27,25 @@ class Config:
     FLASK_ENV  = os.getenv('FLASK_ENV', 'production')
     DEBUG      = os.getenv('FLASK_DEBUG', 'False').lower() in ('true', '1', 't')
 
+    # Los ficheros estáticos pueden cachearse un día; Flask añade ETag y
+    # responde 304 cuando el navegador revalida.
+    SEND_FILE_MAX_AGE_DEFAULT = 86_400
+
+    # No re-lanzar excepciones hacia el servidor WSGI en producción:
+    # el handler de errores de Flask responde 500 sin el overhead del
+    # middleware de depuración. Con DEBUG se deja en None (el valor por
+    # defecto de Flask) para que el debugger interactivo siga recibiendo
+    # las excepciones en desarrollo.
+    PROPAGATE_EXCEPTIONS = None if DEBUG else False
+
     # ── Sesión ─────────────────────────────────────────────────────────────────
     SESSION_COOKIE_HTTPONLY  = True
     SESSION_COOKIE_SAMESITE  = 'Lax'
-    SESSION_COOKIE_SECURE    = not DEBUG   # True en producción (HTTPS)
\ No newline at end of file
+    SESSION_COOKIE_SECURE    = not DEBUG   # True en producción (HTTPS)
+
+    # Almacenamiento de sesión del lado servidor (opcional).
+    # Con SESSION_TYPE='redis' la cookie pasa a ser solo un id corto y el
+    # contenido vive en Redis; sin definirla se usa la cookie firmada de
+    # Flask (comportamiento por defecto).
+    SESSION_TYPE      = os.getenv('SESSION_TYPE')
+    SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0')
\ No newline at end of file
@@ -0,0 +1,13 @@
+# gunicorn.conf.py — Configuración del servidor WSGI de producción
+#
+# Workers gthread: cada worker atiende varias peticiones en hilos. Las
+# llamadas a Firestore son I/O gRPC que libera el GIL, así que mientras
+# una petición espera la respuesta de la base de datos, otros hilos del
+# mismo worker siguen sirviendo tráfico.
+import os
+
+bind         = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+worker_class = 'gthread'
+workers      = int(os.getenv('WEB_CONCURRENCY', '4'))
+threads      = int(os.getenv('GUNICORN_THREADS', '8'))
+timeout      = 30
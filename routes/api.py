@@ -1,15 +1,66 @@
 # routes/api.py — Blueprint de API interna (analíticas y recomendaciones)
+import re
+import threading
 from datetime import datetime
 
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, current_app, jsonify, request, session
 
-from config.database import get_habits_collection
+from config.database import get_analytics_collection, get_db, get_habits_collection
 from services.cookies import get_cookie_settings
+from services.cache import TTLCache
+from services.dates import today_str
 from services.security import login_required, validate_csrf_token
 
 api_bp = Blueprint('api', __name__)
 
 
+# Caché por usuario del payload de recomendaciones (60 s). Como en el
+# dashboard, la clave incluye la fecha (expira sola al cambiar de día) y
+# la versión de escritura guardada en sesión (ver _habits_version en
+# routes/habits.py): la sesión es compartida entre workers, así que una
+# escritura de hábitos hace inalcanzables las entradas viejas en todos
+# los procesos, no solo en el que atendió la escritura.
+_recommendations_cache = TTLCache(ttl_seconds=60)
+
+
+def invalidate_recommendations(user_id: str, version: int):
+    """Libera la entrada local de recomendaciones tras una escritura.
+
+    La invalidación global la da el cambio de versión en la clave; esto
+    solo recupera memoria de la entrada obsoleta en este worker.
+    """
+    _recommendations_cache.invalidate((user_id, today_str(), version))
+
+
+# ── Buffer de eventos de analítica ─────────────────────────────────────────────
+
+# Los eventos se acumulan en proceso y se escriben en un solo WriteBatch
+# cada _BEHAVIOR_FLUSH_SIZE eventos: un round-trip a Firestore por lote en
+# vez de uno por evento. Los eventos que queden en el buffer al reiniciar
+# el worker se pierden; aceptable para analítica best-effort.
+_BEHAVIOR_FLUSH_SIZE = 20
+_behavior_buffer     = []
+_behavior_lock       = threading.Lock()
+
+
+def _flush_behavior_events():
+    """Vuelca el buffer a la colección 'analytics' si alcanzó el umbral."""
+    with _behavior_lock:
+        if len(_behavior_buffer) < _BEHAVIOR_FLUSH_SIZE:
+            return
+        events = _behavior_buffer[:]
+        _behavior_buffer.clear()
+
+    try:
+        analytics = get_analytics_collection()
+        batch     = get_db().batch()
+        for event in events:
+            batch.set(analytics.document(), event)
+        batch.commit()
+    except Exception as e:
+        current_app.logger.error('Error persistiendo eventos de analítica: %s', e)
+
+
 @api_bp.route('/analytics/behavior', methods=['POST'])
 @login_required
 def track_user_behavior():
@@ -29,8 +80,9 @@ def track_user_behavior():
         'timestamp':  datetime.now(),
         'anonymous':  cookie_settings.get('anonymous_data', True),
     }
-    # TODO: persistir en colección 'analytics' de MongoDB
-    print(f"Behavior tracked: {behavior_data}")
+    with _behavior_lock:
+        _behavior_buffer.append(behavior_data)
+    _flush_behavior_events()
 
     return jsonify({'success': True})
 
@@ -47,18 +99,40 @@ def get_recommendations():
         return jsonify({'recommendations': []})
 
     try:
-        habits = list(get_habits_collection().find({'user_id': session['user_id']}))
-        recommendations = _build_recommendations(habits)
-        today           = datetime.now().strftime('%Y-%m-%d')
-        completed_today = sum(1 for h in habits if today in h.get('completed_dates', []))
-        completion_rate = (completed_today / len(habits) * 100) if habits else 0
-
-        return jsonify({
-            'success':          True,
-            'recommendations':  recommendations,
-            'completion_rate':  completion_rate,
-            'total_habits':     len(habits),
-        })
+        today     = today_str()
+        cache_key = (
+            session['user_id'], today, session.get('habits_version', 0)
+        )
+
+        payload = _recommendations_cache.get(cache_key)
+        if payload is None:
+            # Solo se leen name y completed_dates; la proyección evita traer
+            # descripción, streak y demás campos del documento.
+            docs = (
+                get_habits_collection()
+                .where('user_id', '==', session['user_id'])
+                .select(['name', 'completed_dates'])
+                .stream()
+            )
+            habits = [doc.to_dict() for doc in docs]
+            recommendations = _build_recommendations(habits)
+            completed_today = sum(1 for h in habits if today in h.get('completed_dates', []))
+            completion_rate = (completed_today / len(habits) * 100) if habits else 0
+
+            payload = {
+                'success':          True,
+                'recommendations':  recommendations,
+                'completion_rate':  completion_rate,
+                'total_habits':     len(habits),
+            }
+            _recommendations_cache.set(cache_key, payload)
+
+        # ETag sobre el cuerpo + make_conditional: los polls repetidos del
+        # frontend reciben un 304 sin cuerpo si nada cambió (mismo patrón
+        # que add_cache_headers en services/security.py).
+        response = jsonify(payload)
+        response.add_etag()
+        return response.make_conditional(request)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -66,13 +140,18 @@ def get_recommendations():
 
 # ── Helpers privados ───────────────────────────────────────────────────────────
 
+# Compiladas una vez al cargar el módulo (como _EMAIL_RE en security):
+# re.I evita el .lower() por hábito y any() corta en el primer match.
+_EXERCISE_RE = re.compile(r'ejercicio|correr|gimnasio|deporte', re.IGNORECASE)
+_READING_RE  = re.compile(r'leer|lectura|libro', re.IGNORECASE)
+
+
 def _build_recommendations(habits: list) -> list:
     """Genera lista de recomendaciones según los hábitos actuales del usuario."""
-    names = [h['name'].lower() for h in habits]
-    recs  = []
+    recs = []
 
     # Ejercicio
-    if not any(k in n for k in ('ejercicio', 'correr', 'gimnasio', 'deporte') for n in names):
+    if not any(_EXERCISE_RE.search(h['name']) for h in habits):
         recs.append({
             'type':       'exercise',
             'message':    '¿Has considerado agregar un hábito de ejercicio?',
@@ -81,7 +160,7 @@ def _build_recommendations(habits: list) -> list:
         })
 
     # Lectura
-    if not any(k in n for k in ('leer', 'lectura', 'libro') for n in names):
+    if not any(_READING_RE.search(h['name']) for h in habits):
         recs.append({
             'type':       'reading',
             'message':    'La lectura es un excelente hábito para desarrollar.',
@@ -91,7 +170,7 @@ def _build_recommendations(habits: list) -> list:
 
     # Motivación basada en tasa de completado
     if habits:
-        today           = datetime.now().strftime('%Y-%m-%d')
+        today           = today_str()
         completed_today = sum(1 for h in habits if today in h.get('completed_dates', []))
         rate            = (completed_today / len(habits)) * 100
 
@@ -3,45 +3,105 @@ from datetime import datetime
 
 from flask import (
     Blueprint, render_template, request,
-    redirect, url_for, flash, session
+    redirect, url_for, flash, session, current_app
 )
 from werkzeug.security import generate_password_hash, check_password_hash
 
-from config.database import get_users_collection
+from config.database import get_users_collection, invalidate_user_cache
 from services.cookies import CookieConfig
-from services.security import is_valid_email, validate_csrf_token
+from services.security import (
+    PASSWORD_HASH_METHOD, is_valid_email, validate_csrf_token
+)
 
 auth_bp = Blueprint('auth', __name__)
 
 
+# Campos que usa login; la proyección evita traer el documento completo.
+_LOGIN_FIELDS = ['username', 'email', 'password', 'cookie_settings']
+
+
 def _find_user_by_username_or_email(username: str):
-    """Busca usuario por username o email en Firestore."""
-    users = get_users_collection()
+    """Busca usuario por username o email en Firestore.
 
-    # Buscar por username
-    docs = users.where('username', '==', username).limit(1).stream()
+    Las cuentas guardan login_keys = [username.lower(), email.lower()],
+    así que una sola consulta array_contains resuelve ambos casos (y es
+    insensible a mayúsculas). Para cuentas anteriores al campo se recurre
+    a la consulta directa: email si el valor contiene '@', username si no.
+    """
+    users = get_users_collection()
+    key   = username.lower()
+
+    docs = (
+        users.where('login_keys', 'array_contains', key)
+        .select(_LOGIN_FIELDS)
+        .limit(1)
+        .stream()
+    )
     for doc in docs:
         data = doc.to_dict()
         data['_id'] = doc.id
         return data
 
-    # Buscar por email
-    docs = users.where('email', '==', username).limit(1).stream()
-    for doc in docs:
-        data = doc.to_dict()
-        data['_id'] = doc.id
-        return data
+    # Fallback para usuarios registrados antes de login_keys. Esas cuentas
+    # guardaron el email tal cual se escribió, así que se prueba primero el
+    # valor literal y después la versión en minúsculas.
+    if '@' in username:
+        candidates = [('email', username)]
+        if key != username:
+            candidates.append(('email', key))
+    else:
+        candidates = [('username', username)]
+
+    for field, value in candidates:
+        docs = (
+            users.where(field, '==', value)
+            .select(_LOGIN_FIELDS)
+            .limit(1)
+            .stream()
+        )
+        for doc in docs:
+            data = doc.to_dict()
+            data['_id'] = doc.id
+            return data
 
     return None
 
 
-def _find_user_by_field(field: str, value: str):
-    """Busca si ya existe un usuario con ese campo/valor."""
+def _find_user_by_field(field: str, value: str) -> bool:
+    """Comprueba si ya existe un usuario con ese campo/valor.
+
+    Solo interesa la existencia, así que la proyección pide únicamente
+    el nombre del documento (cero campos transferidos).
+    """
     users = get_users_collection()
-    docs = users.where(field, '==', value).limit(1).stream()
-    for doc in docs:
-        return doc.to_dict()
-    return None
+    docs = (
+        users.where(field, '==', value)
+        .select(['__name__'])
+        .limit(1)
+        .stream()
+    )
+    return any(True for _ in docs)
+
+
+def _login_key_taken(key: str, legacy_field: str, legacy_value: str) -> bool:
+    """Comprueba si un login key (username/email en minúsculas) ya está en uso.
+
+    Debe usar la misma clave que la búsqueda de login: si solo se
+    verificara el campo exacto, 'Bob' y 'bob' podrían registrarse ambos
+    y la consulta array_contains del login devolvería uno arbitrario.
+    Para cuentas anteriores a login_keys se consulta además el campo
+    directo.
+    """
+    users = get_users_collection()
+    docs = (
+        users.where('login_keys', 'array_contains', key)
+        .select(['__name__'])
+        .limit(1)
+        .stream()
+    )
+    if any(True for _ in docs):
+        return True
+    return _find_user_by_field(legacy_field, legacy_value)
 
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
@@ -56,7 +116,7 @@ def register():
             return render_template('register.html')
 
         username         = request.form.get('username', '').strip()
-        email            = request.form.get('email', '').strip()
+        email            = request.form.get('email', '').strip().lower()
         password         = request.form.get('password', '')
         confirm_password = request.form.get('confirm_password', '')
 
@@ -80,12 +140,12 @@ def register():
         try:
             users = get_users_collection()
 
-            # Verificar duplicados
-            if _find_user_by_field('username', username):
+            # Verificar duplicados (insensible a mayúsculas, como el login)
+            if _login_key_taken(username.lower(), 'username', username):
                 flash('El nombre de usuario ya está en uso.', 'error')
                 return render_template('register.html')
 
-            if _find_user_by_field('email', email):
+            if _login_key_taken(email, 'email', email):
                 flash('El email ya está registrado.', 'error')
                 return render_template('register.html')
 
@@ -95,7 +155,8 @@ def register():
             user_data = {
                 'username':        username,
                 'email':           email,
-                'password':        generate_password_hash(password),
+                'login_keys':      [username.lower(), email],
+                'password':        generate_password_hash(password, method=PASSWORD_HASH_METHOD),
                 'created_at':      datetime.now().isoformat(),
                 'last_login':      None,
                 'cookie_settings': cookie_settings,
@@ -114,7 +175,7 @@ def register():
             return redirect(url_for('habits.index'))
 
         except Exception as e:
-            print(f"ERROR en register: {e}")
+            current_app.logger.error('ERROR en register: %s', e)
             flash('Error al crear la cuenta.', 'error')
 
     return render_template('register.html')
@@ -147,6 +208,7 @@ def login():
                     get_users_collection().document(user['_id']).update({
                         'last_login': datetime.now().isoformat()
                     })
+                    invalidate_user_cache(user['_id'])
                 except Exception:
                     pass
 
@@ -164,7 +226,7 @@ def login():
             flash('Usuario o contraseña incorrectos.', 'error')
 
         except Exception as e:
-            print(f"ERROR en login: {e}")
+            current_app.logger.error('ERROR en login: %s', e)
             flash('Error al procesar el inicio de sesión.', 'error')
 
     return render_template('login.html')
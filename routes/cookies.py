@@ -3,10 +3,11 @@ from datetime import datetime
 
 from flask import (
     Blueprint, render_template, request,
-    redirect, url_for, flash, session, jsonify
+    redirect, url_for, flash, session, jsonify, current_app
 )
+from firebase_admin import firestore
 
-from config.database import get_users_collection
+from config.database import get_users_collection, invalidate_user_cache
 from services.cookies import (
     get_cookie_settings, save_cookie_settings, build_settings_from_form
 )
@@ -111,13 +112,12 @@ def clear_cookies():
     session.pop('cookie_settings', None)
 
     try:
-        from bson import ObjectId
-        get_users_collection().update_one(
-            {'_id': ObjectId(session['user_id'])},
-            {'$unset': {'cookie_settings': ''}}
-        )
+        get_users_collection().document(session['user_id']).update({
+            'cookie_settings': firestore.DELETE_FIELD
+        })
+        invalidate_user_cache(session['user_id'])
     except Exception as e:
-        print(f"Error eliminando cookie_settings de DB: {e}")
+        current_app.logger.error('Error eliminando cookie_settings de DB: %s', e)
 
     response = jsonify({'success': True, 'message': 'Cookies eliminadas correctamente.'})
     response.set_cookie('user_preferences',  '', expires=0)
@@ -3,20 +3,68 @@ from datetime import datetime, timedelta
 
 from flask import (
     Blueprint, render_template, request,
-    redirect, url_for, flash, session
+    redirect, url_for, flash, session, jsonify, current_app,
+    stream_template
 )
+from firebase_admin import firestore
 
-from config.database import get_habits_collection, get_users_collection
+from config.database import get_db, get_habits_collection, get_user_cached
+from services.cache import TTLCache
+from services.dates import today_str, week_dates_set
 from services.security import login_required, validate_csrf_token
 
 habits_bp = Blueprint('habits', __name__)
 
+# Ventana de retención del array completed_dates. Las estadísticas del
+# dashboard solo miran hoy y la última semana; el total histórico vive en
+# el campo desnormalizado completed_count, así que el array puede acotarse
+# para que los documentos calientes no crezcan sin límite.
+COMPLETED_DATES_RETENTION_DAYS = 90
+
+# Caché por usuario del contexto del dashboard (60 s). La clave incluye la
+# fecha para que expire sola al cambiar de día; cada escritura de hábitos
+# la invalida explícitamente.
+_dashboard_cache = TTLCache(ttl_seconds=60)
+
+
+def _habits_version() -> int:
+    """Contador de escrituras de hábitos del usuario, guardado en sesión.
+
+    La TTLCache vive por worker, pero la sesión es compartida entre todos
+    (cookie firmada o Redis). Incluir esta versión en la clave de caché
+    garantiza read-your-writes con gunicorn multi-worker: tras una
+    escritura, la versión sube y la entrada vieja deja de ser alcanzable
+    sin importar qué worker atienda el siguiente request.
+    """
+    return session.get('habits_version', 0)
+
+
+def _invalidate_dashboard(user_id: str):
+    """Invalida las cachés derivadas de los hábitos del usuario tras una escritura."""
+    version = _habits_version()
+    _dashboard_cache.invalidate((user_id, today_str(), version))
+    # Import local para evitar el ciclo habits ↔ api al cargar los blueprints.
+    from routes.api import invalidate_recommendations
+    invalidate_recommendations(user_id, version)
+    session['habits_version'] = version + 1
+
 
 def _get_user_habits(user_id: str) -> list:
-    """Obtiene todos los hábitos del usuario ordenados por fecha."""
+    """Obtiene todos los hábitos del usuario ordenados por fecha.
+
+    El ordenamiento lo hace Firestore (índice compuesto user_id + created_at,
+    ver firestore.indexes.json), así evitamos el sort en Python. La
+    proyección select() limita la respuesta a los campos que usa el
+    template, en lugar de transferir el documento completo.
+    """
     docs = (
         get_habits_collection()
         .where('user_id', '==', user_id)
+        .order_by('created_at', direction=firestore.Query.DESCENDING)
+        .select([
+            'name', 'description', 'created_at', 'completed_dates',
+            'completed_count', 'last_completed',
+        ])
         .stream()
     )
     habits = []
@@ -33,10 +81,80 @@ def _get_user_habits(user_id: str) -> list:
 
         habits.append(data)
 
-    habits.sort(key=lambda h: h.get('created_at', datetime.now()), reverse=True)
     return habits
 
 
+def _count_query(query) -> int:
+    """Ejecuta una agregación count() de Firestore y devuelve el entero."""
+    result = query.count().get()
+    return int(result[0][0].value)
+
+
+def _completion_update(habit: dict, today: str) -> dict:
+    """Construye el dict de actualización para completar un hábito hoy.
+
+    ArrayUnion es atómico e idempotente: añade la fecha en el servidor sin
+    reescribir el array completo ni arriesgar una carrera leer-modificar-
+    escribir. En la misma escritura se mantienen los campos desnormalizados
+    completed_count / current_streak / last_completed, y si hay fechas
+    fuera de la ventana de retención el array se reescribe recortado (ruta
+    poco frecuente).
+    """
+    yesterday = (
+        datetime.fromisoformat(today) - timedelta(days=1)
+    ).strftime('%Y-%m-%d')
+    streak = (
+        habit.get('current_streak', 0) + 1
+        if habit.get('last_completed') == yesterday
+        else 1
+    )
+
+    old_dates = habit.get('completed_dates', [])
+
+    # Hábitos anteriores al campo desnormalizado: Increment(1) crearía el
+    # contador en 1 y perdería el historial acumulado (irrecuperable tras
+    # el primer recorte de retención). Se inicializa con el total real del
+    # array; el handler ya hace leer-modificar-escribir para el streak,
+    # así que no se pierde atomicidad. Con el campo presente, Increment
+    # mantiene la suma atómica en el servidor.
+    if 'completed_count' in habit:
+        completed_count = firestore.Increment(1)
+    else:
+        completed_count = len(old_dates) + 1
+
+    update = {
+        'completed_count': completed_count,
+        'current_streak':  streak,
+        'last_completed':  today,
+    }
+
+    retention_floor = (
+        datetime.fromisoformat(today)
+        - timedelta(days=COMPLETED_DATES_RETENTION_DAYS)
+    ).strftime('%Y-%m-%d')
+
+    if old_dates and min(old_dates) < retention_floor:
+        update['completed_dates'] = sorted(
+            d for d in old_dates if d >= retention_floor
+        ) + [today]
+    else:
+        update['completed_dates'] = firestore.ArrayUnion([today])
+
+    return update
+
+
+def _wants_json() -> bool:
+    """True si la petición viene de fetch/AJAX y espera una respuesta JSON.
+
+    Permite responder con un JSON pequeño en vez de redirigir y
+    re-renderizar el dashboard completo tras cada acción.
+    """
+    return (
+        request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+        or request.accept_mimetypes.best == 'application/json'
+    )
+
+
 @habits_bp.route('/')
 @login_required
 def index():
@@ -46,30 +164,47 @@ def index():
     total_habits     = 0
     completion_rate  = 0.0
     week_completions = 0
-    today = datetime.now().strftime('%Y-%m-%d')
+    today = today_str()
+
+    cache_key = (session['user_id'], today, _habits_version())
+    cached    = _dashboard_cache.get(cache_key)
+    if cached is not None:
+        return stream_template('index.html', **cached)
 
     try:
         habits       = _get_user_habits(session['user_id'])
         total_habits = len(habits)
 
-        today_completed = sum(
-            1 for h in habits if today in h.get('completed_dates', [])
-        )
+        # Una sola pasada sobre los hábitos calcula ambas estadísticas.
+        # El set de la semana permite comprobar la intersección en
+        # O(fechas) por hábito en vez del doble bucle con `in` sobre lista.
+        week_dates = week_dates_set()
+        for h in habits:
+            dates = h.get('completed_dates', [])
+            if today in dates:
+                today_completed += 1
+            if not week_dates.isdisjoint(dates):
+                week_completions += 1
 
         if total_habits > 0:
             completion_rate = round((today_completed / total_habits) * 100, 1)
 
-        week_dates = [
-            (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            for i in range(7)
-        ]
-        week_completions = sum(
-            1 for h in habits
-            if any(d in week_dates for d in h.get('completed_dates', []))
-        )
+        context = {
+            'habits':           habits,
+            'today':            today,
+            'today_completed':  today_completed,
+            'total_habits':     total_habits,
+            'completion_rate':  completion_rate,
+            'week_completions': week_completions,
+        }
+        _dashboard_cache.set(cache_key, context)
+        # stream_template envía el HTML por trozos: el navegador recibe el
+        # <head> y empieza a cargar CSS/JS mientras el resto del listado
+        # aún se está renderizando.
+        return stream_template('index.html', **context)
 
     except Exception as e:
-        print(f"ERROR en index: {e}")
+        current_app.logger.error('ERROR en index: %s', e)
         flash('Error al cargar los hábitos.', 'error')
 
     return render_template(
@@ -104,11 +239,15 @@ def add_habit():
             'description':     habit_description,
             'created_at':      datetime.now().isoformat(),
             'completed_dates': [],
+            'completed_count': 0,
+            'current_streak':  0,
+            'last_completed':  None,
             'user_id':         session['user_id'],
         })
+        _invalidate_dashboard(session['user_id'])
         flash('¡Hábito agregado correctamente!', 'success')
     except Exception as e:
-        print(f"ERROR en add_habit: {e}")
+        current_app.logger.error('ERROR en add_habit: %s', e)
         flash('Error al agregar el hábito.', 'error')
 
     return redirect(url_for('habits.index'))
@@ -122,35 +261,101 @@ def complete_habit(habit_id):
         flash('Token de seguridad inválido.', 'error')
         return redirect(url_for('habits.index'))
 
-    today = datetime.now().strftime('%Y-%m-%d')
+    today = today_str()
 
     try:
         habits_col = get_habits_collection()
         doc_ref    = habits_col.document(habit_id)
-        doc        = doc_ref.get()
+        doc        = doc_ref.get(field_paths=[
+            'user_id', 'completed_dates', 'completed_count',
+            'current_streak', 'last_completed',
+        ])
 
         if not doc.exists or doc.to_dict().get('user_id') != session['user_id']:
+            if _wants_json():
+                return jsonify({'ok': False, 'error': 'Hábito no encontrado.'}), 404
             flash('Hábito no encontrado.', 'error')
             return redirect(url_for('habits.index'))
 
         habit = doc.to_dict()
-        completed_dates = habit.get('completed_dates', [])
 
-        if today in completed_dates:
+        if today in habit.get('completed_dates', []):
+            if _wants_json():
+                return jsonify({'ok': True, 'already_completed': True})
             flash('Este hábito ya fue completado hoy.', 'info')
             return redirect(url_for('habits.index'))
 
-        completed_dates.append(today)
-        doc_ref.update({'completed_dates': completed_dates})
+        doc_ref.update(_completion_update(habit, today))
+        _invalidate_dashboard(session['user_id'])
+
+        if _wants_json():
+            return jsonify({'ok': True, 'habit_id': habit_id, 'date': today})
         flash('¡Hábito completado! ✅', 'success')
 
     except Exception as e:
-        print(f"ERROR en complete_habit: {e}")
+        current_app.logger.error('ERROR en complete_habit: %s', e)
+        if _wants_json():
+            return jsonify({'ok': False, 'error': 'Error al completar el hábito.'}), 500
         flash('Error al completar el hábito.', 'error')
 
     return redirect(url_for('habits.index'))
 
 
+@habits_bp.route('/complete_habits', methods=['POST'])
+@login_required
+def complete_habits():
+    """Marca varios hábitos como completados hoy en una sola escritura.
+
+    Acepta JSON {'habit_ids': [...]} y usa get_all + WriteBatch: dos idas
+    y vueltas a Firestore para N hábitos, en vez de 2×N peticiones
+    individuales.
+    """
+    if not validate_csrf_token():
+        return jsonify({'error': 'Token CSRF inválido.'}), 403
+
+    data      = request.get_json(silent=True) or {}
+    habit_ids = data.get('habit_ids')
+
+    if not habit_ids or not isinstance(habit_ids, list):
+        return jsonify({'error': 'habit_ids es requerido.'}), 400
+
+    today = today_str()
+
+    try:
+        db         = get_db()
+        habits_col = get_habits_collection()
+
+        # Límite de un WriteBatch de Firestore: 500 operaciones.
+        refs = [habits_col.document(str(h)) for h in habit_ids[:500]]
+        docs = db.get_all(refs, field_paths=[
+            'user_id', 'completed_dates', 'completed_count',
+            'current_streak', 'last_completed',
+        ])
+
+        batch     = db.batch()
+        completed = []
+        for doc in docs:
+            if not doc.exists:
+                continue
+            habit = doc.to_dict()
+            if habit.get('user_id') != session['user_id']:
+                continue
+            if today in habit.get('completed_dates', []):
+                continue
+            batch.update(doc.reference, _completion_update(habit, today))
+            completed.append(doc.id)
+
+        if completed:
+            batch.commit()
+            _invalidate_dashboard(session['user_id'])
+
+        return jsonify({'success': True, 'completed': completed, 'date': today})
+
+    except Exception as e:
+        current_app.logger.error('ERROR en complete_habits: %s', e)
+        return jsonify({'error': 'Error al completar los hábitos.'}), 500
+
+
 @habits_bp.route('/edit_habit/<habit_id>', methods=['GET', 'POST'])
 @login_required
 def edit_habit(habit_id):
@@ -158,7 +363,7 @@ def edit_habit(habit_id):
     try:
         habits_col = get_habits_collection()
         doc_ref    = habits_col.document(habit_id)
-        doc        = doc_ref.get()
+        doc        = doc_ref.get(field_paths=['name', 'description', 'user_id'])
 
         if not doc.exists or doc.to_dict().get('user_id') != session['user_id']:
             flash('Hábito no encontrado.', 'error')
@@ -180,11 +385,12 @@ def edit_habit(habit_id):
                 return render_template('edit_habit.html', habit=habit)
 
             doc_ref.update({'name': habit_name, 'description': habit_description})
+            _invalidate_dashboard(session['user_id'])
             flash('¡Hábito actualizado!', 'success')
             return redirect(url_for('habits.index'))
 
     except Exception as e:
-        print(f"ERROR en edit_habit: {e}")
+        current_app.logger.error('ERROR en edit_habit: %s', e)
         flash('Error al cargar el hábito.', 'error')
         return redirect(url_for('habits.index'))
 
@@ -201,17 +407,18 @@ def delete_habit(habit_id):
 
     try:
         doc_ref = get_habits_collection().document(habit_id)
-        doc     = doc_ref.get()
+        doc     = doc_ref.get(field_paths=['user_id'])
 
         if not doc.exists or doc.to_dict().get('user_id') != session['user_id']:
             flash('Hábito no encontrado.', 'error')
             return redirect(url_for('habits.index'))
 
         doc_ref.delete()
+        _invalidate_dashboard(session['user_id'])
         flash('Hábito eliminado correctamente.', 'success')
 
     except Exception as e:
-        print(f"ERROR en delete_habit: {e}")
+        current_app.logger.error('ERROR en delete_habit: %s', e)
         flash('Error al eliminar el hábito.', 'error')
 
     return redirect(url_for('habits.index'))
@@ -224,26 +431,28 @@ def profile():
     user            = None
     habit_count     = 0
     completed_today = 0
-    today = datetime.now().strftime('%Y-%m-%d')
+    today = today_str()
 
     try:
-        # Obtener datos del usuario
-        doc = get_users_collection().document(session['user_id']).get()
-        if doc.exists:
-            user = doc.to_dict()
-            user['_id'] = doc.id
+        # Obtener datos del usuario (caché TTL, evita releer Firestore)
+        cached = get_user_cached(session['user_id'])
+        if cached:
+            user = dict(cached)
             # Convertir created_at a datetime si es string
             if isinstance(user.get('created_at'), str):
                 user['created_at'] = datetime.fromisoformat(user['created_at'])
 
-        habits      = _get_user_habits(session['user_id'])
-        habit_count = len(habits)
-        completed_today = sum(
-            1 for h in habits if today in h.get('completed_dates', [])
+        # Contar en el servidor (agregación count) en vez de traer todos
+        # los documentos solo para contarlos.
+        habits_col  = get_habits_collection()
+        user_query  = habits_col.where('user_id', '==', session['user_id'])
+        habit_count = _count_query(user_query)
+        completed_today = _count_query(
+            user_query.where('completed_dates', 'array_contains', today)
         )
 
     except Exception as e:
-        print(f"ERROR en profile: {e}")
+        current_app.logger.error('ERROR en profile: %s', e)
         flash('Error al cargar el perfil.', 'error')
 
     return render_template(
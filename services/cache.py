@@ -0,0 +1,50 @@
+# services/cache.py — Caché en memoria con TTL, por proceso worker
+import threading
+import time
+
+
+class TTLCache:
+    """Caché clave → valor con expiración por entrada.
+
+    Pensada para datos que cambian poco (documento de usuario, estadísticas
+    del dashboard): evita una ida y vuelta a Firestore dentro de la ventana
+    del TTL. Es local al proceso — cada worker de gunicorn tiene la suya —
+    por lo que solo debe usarse con invalidación explícita en las escrituras
+    o con datos donde una ligera desactualización sea aceptable.
+    """
+
+    def __init__(self, ttl_seconds: float, maxsize: int = 1024):
+        self.ttl     = ttl_seconds
+        self.maxsize = maxsize
+        self._data   = {}          # clave -> (expira_en, valor)
+        self._lock   = threading.Lock()
+
+    def get(self, key):
+        """Devuelve el valor cacheado o None si no existe o expiró."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        """Guarda el valor; si la caché está llena, purga lo expirado."""
+        with self._lock:
+            if len(self._data) >= self.maxsize:
+                now = time.monotonic()
+                self._data = {
+                    k: v for k, v in self._data.items() if v[0] > now
+                }
+                # Si sigue llena, descartar entradas arbitrarias antiguas
+                while len(self._data) >= self.maxsize:
+                    self._data.pop(next(iter(self._data)))
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key):
+        """Elimina una entrada (llamar tras escribir en la fuente real)."""
+        with self._lock:
+            self._data.pop(key, None)
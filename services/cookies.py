@@ -1,15 +1,18 @@
 # services/cookies.py — Lógica de negocio para gestión de cookies
 import json
 from datetime import datetime
+from types import MappingProxyType
 
-from flask import session, request
-#from bson import ObjectId
+from flask import session, request, current_app, g
 
 
 # ── Configuración de cookies ───────────────────────────────────────────────────
 
 class CookieConfig:
-    DEFAULT_SETTINGS = {
+    # MappingProxyType congela ambas tablas: son constantes compartidas por
+    # todas las peticiones y una mutación accidental (p. ej. olvidar el
+    # .copy()) contaminaría a todos los usuarios del proceso.
+    DEFAULT_SETTINGS = MappingProxyType({
         'essential_cookies':     True,
         'preference_cookies':    True,
         'analytics_cookies':     True,
@@ -22,15 +25,15 @@ class CookieConfig:
         'cookie_consent_given':  False,
         'cookie_consent_date':   None,
         'last_updated':          None,
-    }
+    })
 
-    EXPIRATION = {
+    EXPIRATION = MappingProxyType({
         'session':       0,
         'short_term':    86_400,       # 1 día
         'medium_term':   2_592_000,    # 30 días
         'long_term':     31_536_000,   # 1 año
         'extended_term': 63_072_000,   # 2 años
-    }
+    })
 
 
 # ── Funciones de acceso ────────────────────────────────────────────────────────
@@ -38,23 +41,34 @@ class CookieConfig:
 def get_cookie_settings() -> dict:
     """
     Devuelve la configuración de cookies del usuario en este orden de prioridad:
-    1. Sesión Flask (más rápido, ya cargado)
-    2. Cookie del navegador 'user_preferences'
-    3. Valores por defecto de CookieConfig
+    1. flask.g (memoizada, misma petición)
+    2. Sesión Flask (más rápido, ya cargado)
+    3. Cookie del navegador 'user_preferences'
+    4. Valores por defecto de CookieConfig
+
+    Varios puntos de la misma petición (rutas, after_request) consultan la
+    configuración; la memoización en g garantiza que el json.loads de la
+    cookie ocurra como mucho una vez por petición.
     """
+    if 'cookie_settings' in g:
+        return g.cookie_settings
+
     if 'cookie_settings' in session:
-        return session['cookie_settings']
+        g.cookie_settings = session['cookie_settings']
+        return g.cookie_settings
 
     raw = request.cookies.get('user_preferences')
     if raw:
         try:
             settings = json.loads(raw)
             session['cookie_settings'] = settings
+            g.cookie_settings = settings
             return settings
         except (json.JSONDecodeError, ValueError):
             pass
 
-    return CookieConfig.DEFAULT_SETTINGS.copy()
+    g.cookie_settings = CookieConfig.DEFAULT_SETTINGS.copy()
+    return g.cookie_settings
 
 
 def save_cookie_settings(settings: dict, users_collection=None) -> dict:
@@ -65,14 +79,17 @@ def save_cookie_settings(settings: dict, users_collection=None) -> dict:
     """
     settings['last_updated'] = datetime.now().isoformat()
     session['cookie_settings'] = settings
+    g.cookie_settings = settings
 
     if 'user_id' in session and users_collection is not None:
         try:
             users_collection.document(session['user_id']).update({
                 'cookie_settings': settings
             })
+            from config.database import invalidate_user_cache
+            invalidate_user_cache(session['user_id'])
         except Exception as e:
-            print(f"Error guardando configuración de cookies en DB: {e}")
+            current_app.logger.error('Error guardando configuración de cookies en DB: %s', e)
 
     return settings
 
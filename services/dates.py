@@ -0,0 +1,26 @@
+# services/dates.py — Utilidades de fechas con caché por petición
+from datetime import datetime, timedelta
+
+from flask import g
+
+
+def today_str() -> str:
+    """Devuelve la fecha de hoy como 'YYYY-MM-DD'.
+
+    Se calcula una sola vez por petición y se guarda en flask.g, para no
+    repetir datetime.now() + strftime en cada punto que necesita la fecha.
+    """
+    if 'today_str' not in g:
+        g.today_str = datetime.now().strftime('%Y-%m-%d')
+    return g.today_str
+
+
+def week_dates_set() -> set:
+    """Set con las fechas de los últimos 7 días (incluido hoy)."""
+    if 'week_dates' not in g:
+        now = datetime.now()
+        g.week_dates = {
+            (now - timedelta(days=i)).strftime('%Y-%m-%d')
+            for i in range(7)
+        }
+    return g.week_dates
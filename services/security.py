@@ -8,26 +8,64 @@ from flask import session, redirect, url_for, flash, request
 
 # ── Middleware global ──────────────────────────────────────────────────────────
 
+# Endpoints GET cuyo contenido apenas cambia: páginas legales/estáticas.
+# Reciben Cache-Control + ETag para que el navegador pueda revalidar con
+# un 304 en vez de forzar un render completo.
+_CACHEABLE_ENDPOINT_PREFIXES = ('pages.', 'cookies.cookies_policy')
+
+# Endpoints de alta frecuencia servidos sin HTML (scrapes de Prometheus,
+# ficheros estáticos): no necesitan CSP ni el resto de headers de página.
+_SKIP_HEADER_ENDPOINTS = frozenset({'static', 'metrics'})
+
+# Headers constantes, construidos una sola vez al cargar el módulo en vez
+# de reconstruir el string de CSP en cada respuesta.
+_STATIC_SECURITY_HEADERS = {
+    'Content-Security-Policy': (
+        "default-src 'self'; "
+        "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
+        "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
+        "font-src 'self' data: https://cdn.jsdelivr.net; "
+        "img-src 'self' data:; "
+        "connect-src 'self'"
+    ),
+    'X-Content-Type-Options':       'nosniff',
+    'X-Frame-Options':              'DENY',
+    'X-XSS-Protection':             '1; mode=block',
+    'Referrer-Policy':              'strict-origin-when-cross-origin',
+    'Cross-Origin-Opener-Policy':   'same-origin',
+    'Cross-Origin-Resource-Policy': 'same-origin',
+}
+
+
 def register_security_middleware(app):
     """Registra el after_request que inyecta headers de seguridad en cada respuesta."""
 
+    # Disponible como {{ csrf_token() }} en los templates para el input
+    # oculto de los formularios (ver TODO en validate_csrf_token).
+    app.context_processor(lambda: {'csrf_token': get_csrf_token})
+
     @app.after_request
     def add_security_headers(response):
-        csp = (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
-            "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
-            "font-src 'self' data: https://cdn.jsdelivr.net; "
-            "img-src 'self' data:; "
-            "connect-src 'self'"
-        )
-        response.headers['Content-Security-Policy']        = csp
-        response.headers['X-Content-Type-Options']         = 'nosniff'
-        response.headers['X-Frame-Options']                = 'DENY'
-        response.headers['X-XSS-Protection']               = '1; mode=block'
-        response.headers['Referrer-Policy']                = 'strict-origin-when-cross-origin'
-        response.headers['Cross-Origin-Opener-Policy']     = 'same-origin'
-        response.headers['Cross-Origin-Resource-Policy']   = 'same-origin'
+        if request.endpoint in _SKIP_HEADER_ENDPOINTS:
+            return response
+
+        response.headers.update(_STATIC_SECURITY_HEADERS)
+        return response
+
+    @app.after_request
+    def add_cache_headers(response):
+        """ETag + Cache-Control para los GET de páginas casi estáticas."""
+        if (
+            request.method == 'GET'
+            and response.status_code == 200
+            and request.endpoint
+            and request.endpoint not in _SKIP_HEADER_ENDPOINTS
+            and request.endpoint.startswith(_CACHEABLE_ENDPOINT_PREFIXES)
+        ):
+            response.cache_control.private = True
+            response.cache_control.max_age = 300
+            response.add_etag()
+            return response.make_conditional(request)
         return response
 
 
@@ -44,12 +82,25 @@ def login_required(f):
     return decorated
 
 
+# ── Contraseñas ────────────────────────────────────────────────────────────────
+
+# Método y coste explícitos para generate_password_hash. scrypt se ejecuta
+# en C (OpenSSL) y libera el GIL; fijar los parámetros aquí evita que un
+# upgrade de Werkzeug cambie la latencia de login/registro sin que lo
+# decidamos nosotros. N=32768, r=8, p=1 ≈ decenas de ms por hash.
+PASSWORD_HASH_METHOD = 'scrypt:32768:8:1'
+
+
 # ── Validaciones ───────────────────────────────────────────────────────────────
 
+# Compilada una sola vez al cargar el módulo; evita el lookup/caché de `re`
+# en cada llamada.
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+
 def is_valid_email(email: str) -> bool:
     """Valida formato de correo electrónico con expresión regular."""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    return _EMAIL_RE.match(email) is not None
 
 
 def validate_csrf_token() -> bool:
@@ -63,4 +114,16 @@ def validate_csrf_token() -> bool:
 
 def generate_csrf_token() -> str:
     """Genera un token CSRF seguro de 32 bytes."""
-    return secrets.token_urlsafe(32)
\ No newline at end of file
+    return secrets.token_urlsafe(32)
+
+
+def get_csrf_token() -> str:
+    """Devuelve el token CSRF de la sesión, generándolo solo la primera vez.
+
+    Un token por sesión (no por petición): evita leer el RNG del sistema
+    en cada request y elimina las carreras de validación cuando varias
+    peticiones AJAX concurrentes verían tokens distintos.
+    """
+    if 'csrf_token' not in session:
+        session['csrf_token'] = generate_csrf_token()
+    return session['csrf_token']
\ No newline at end of file
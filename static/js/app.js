@@ -15,6 +15,9 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Contador de hábitos
     updateHabitStats();
+
+    // Completar hábitos vía fetch (sin recargar toda la página)
+    initAjaxCompleteForms();
 });
 
 function animateElements() {
@@ -389,4 +392,39 @@ document.addEventListener('DOMContentLoaded', function() {
         childList: true,
         subtree: true
     });
-});
\ No newline at end of file
+});
+
+function initAjaxCompleteForms() {
+    // Envía "Completar Hoy" por fetch: el servidor responde un JSON pequeño
+    // en vez de redirigir y re-renderizar todo el dashboard.
+    const forms = document.querySelectorAll('form[action*="/complete_habit/"]');
+
+    forms.forEach(form => {
+        form.addEventListener('submit', function(e) {
+            e.preventDefault();
+
+            fetch(form.action, {
+                method: 'POST',
+                headers: {
+                    'Accept': 'application/json',
+                    'X-Requested-With': 'XMLHttpRequest'
+                }
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.ok) {
+                    const btn = form.querySelector('button');
+                    btn.disabled = true;
+                    btn.classList.remove('btn-success');
+                    btn.classList.add('btn-outline-success');
+                    btn.textContent = '✅ Completado';
+                    updateHabitStats();
+                } else {
+                    // Fallback: navegación clásica con mensaje flash
+                    form.submit();
+                }
+            })
+            .catch(() => form.submit());
+        });
+    });
+}